@@ -0,0 +1,135 @@
+#!/usr/bin/env python3
+"""
+Parsing checker for Eliano email processor
+Runs sample messages through the MIME decoding of email-processor.py
+without touching the database
+"""
+
+import sys
+import os
+import email
+import importlib.util
+
+# Colors for output
+class Colors:
+    GREEN = '\033[92m'
+    RED = '\033[91m'
+    END = '\033[0m'
+
+def print_status(message, success):
+    prefix = Colors.GREEN + "✓ " if success else Colors.RED + "✗ "
+    print(f"{prefix}{message}{Colors.END}")
+
+def load_processor():
+    """Load email-processor.py (hyphenated name, so not importable directly)"""
+    path = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'email-processor.py')
+    spec = importlib.util.spec_from_file_location('email_processor', path)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module.EmailProcessor()
+
+def check(name, actual, expected):
+    success = actual == expected
+    print_status(f"{name}: {actual!r}" if success else f"{name}: expected {expected!r}, got {actual!r}", success)
+    return success
+
+def main():
+    processor = load_processor()
+    results = []
+
+    # Latin-1 body declared as iso-8859-1
+    message = email.message_from_bytes(
+        b"Content-Type: text/plain; charset=iso-8859-1\n"
+        b"Content-Transfer-Encoding: 8bit\n\n" + "Olá ação".encode('latin-1')
+    )
+    parts = processor.parse_message_parts(message)
+    results.append(check("Latin-1 body", parts['text_body'], "Olá ação"))
+
+    # Bogus and non-text charsets fall back instead of raising
+    for charset in ('base64', 'zlib', 'rot13', 'x-does-not-exist'):
+        message = email.message_from_bytes(
+            f"Content-Type: text/plain; charset={charset}\n"
+            "Content-Transfer-Encoding: 8bit\n\n".encode() + "olá".encode('utf-8')
+        )
+        parts = processor.parse_message_parts(message)
+        results.append(check(f"Charset {charset}", parts['text_body'], "olá"))
+
+    # Raw 8-bit UTF-8 headers
+    message = email.message_from_bytes(
+        "From: José <j@example.com>\nSubject: olá\n\nbody".encode('utf-8')
+    )
+    results.append(check("8-bit From", processor.decode_header_value(message.get('From')), "José <j@example.com>"))
+    results.append(check("8-bit Subject", processor.decode_header_value(message.get('Subject')), "olá"))
+
+    # Multipart with text, HTML and an attachment
+    message = email.message_from_bytes(
+        b"MIME-Version: 1.0\n"
+        b"Content-Type: multipart/mixed; boundary=OUTER\n\n"
+        b"--OUTER\n"
+        b"Content-Type: multipart/alternative; boundary=INNER\n\n"
+        b"--INNER\n"
+        b"Content-Type: text/plain; charset=utf-8\n\n"
+        b"plain text\n"
+        b"--INNER\n"
+        b"Content-Type: text/html; charset=utf-8\n\n"
+        b"<p>html</p>\n"
+        b"--INNER--\n"
+        b"--OUTER\n"
+        b"Content-Type: application/pdf\n"
+        b"Content-Disposition: attachment; filename=\"=?utf-8?q?relat=C3=B3rio.pdf?=\"\n"
+        b"Content-Transfer-Encoding: base64\n\n"
+        b"aGVsbG8=\n"
+        b"--OUTER--\n"
+    )
+    parts = processor.parse_message_parts(message)
+    results.append(check("Multipart text", parts['text_body'].strip(), "plain text"))
+    results.append(check("Multipart HTML", parts['html_body'].strip(), "<p>html</p>"))
+    results.append(check("Multipart attachments", parts['attachments'], [
+        {'filename': 'relatório.pdf', 'content_type': 'application/pdf', 'size': 5}
+    ]))
+
+    # Raw 8-bit UTF-8 attachment filename
+    message = email.message_from_bytes(
+        b"MIME-Version: 1.0\n"
+        b"Content-Type: multipart/mixed; boundary=OUTER\n\n"
+        b"--OUTER\n"
+        b"Content-Type: text/plain\n\n"
+        b"body\n"
+        b"--OUTER\n"
+        b"Content-Type: application/pdf\n"
+        + "Content-Disposition: attachment; filename=\"relatório.pdf\"\n".encode('utf-8') +
+        b"Content-Transfer-Encoding: base64\n\n"
+        b"aGVsbG8=\n"
+        b"--OUTER--\n"
+    )
+    parts = processor.parse_message_parts(message)
+    results.append(check("8-bit filename", [a['filename'] for a in parts['attachments']], ['relatório.pdf']))
+
+    # Attached message is listed as attachment and not merged into the body
+    message = email.message_from_bytes(
+        b"MIME-Version: 1.0\n"
+        b"Content-Type: multipart/mixed; boundary=OUTER\n\n"
+        b"--OUTER\n"
+        b"Content-Type: text/plain\n\n"
+        b"outer\n"
+        b"--OUTER\n"
+        b"Content-Type: message/rfc822\n"
+        b"Content-Disposition: attachment; filename=\"fwd.eml\"\n\n"
+        b"Subject: inner\n\n"
+        b"inner body\n"
+        b"--OUTER--\n"
+    )
+    parts = processor.parse_message_parts(message)
+    results.append(check("Attached message body", parts['text_body'].strip(), "outer"))
+    results.append(check("Attached message attachments", parts['attachments'], [
+        {'filename': 'fwd.eml', 'content_type': 'message/rfc822', 'size': 0}
+    ]))
+
+    if all(results):
+        print(f"\n{Colors.GREEN}All parsing checks passed{Colors.END}")
+        sys.exit(0)
+    print(f"\n{Colors.RED}{results.count(False)} parsing check(s) failed{Colors.END}")
+    sys.exit(1)
+
+if __name__ == "__main__":
+    main()
@@ -21,6 +21,9 @@ from Crypto.Random import get_random_bytes
 from Crypto.Util.Padding import pad, unpad
 import base64
 import hashlib
+import codecs
+from email.message import Message
+from functools import lru_cache
 
 # Configure logging
 logging.basicConfig(
@@ -33,6 +36,35 @@ logging.basicConfig(
 )
 logger = logging.getLogger(__name__)
 
+# Charsets tried, in order, when the declared one is missing or fails.
+# latin-1 maps every byte, so it is the final fallback and never fails.
+FALLBACK_CHARSETS = ('utf-8', 'windows-1252', 'latin-1')
+
+@lru_cache(maxsize=64)
+def lookup_codec(charset):
+    """Resolve a MIME charset label to a Python codec name (cached)"""
+    if not charset:
+        return None
+    try:
+        codec_name = codecs.lookup(charset.strip().strip('"').lower()).name
+        # Bytes-to-bytes codecs such as base64, zlib or hex decode to bytes
+        decoder = codecs.getincrementaldecoder(codec_name)()
+        if not isinstance(decoder.decode(b'', final=True), str):
+            return None
+    except Exception:
+        return None
+    return codec_name
+
+def decode_bytes(payload, charset=None):
+    """Decode bytes with the declared charset, falling back to common ones"""
+    declared = lookup_codec(charset)
+    candidates = (declared,) + FALLBACK_CHARSETS if declared else FALLBACK_CHARSETS
+    for codec_name in candidates:
+        try:
+            return payload.decode(codec_name)
+        except (UnicodeError, LookupError):
+            continue
+
 class EmailProcessor:
     def __init__(self):
         # Load environment variables
@@ -141,17 +173,13 @@ class EmailProcessor:
             return ""
         
         try:
-            decoded_fragments = decode_header(header_value)
-            decoded_string = ""
-            for fragment, encoding in decoded_fragments:
+            decoded_fragments = []
+            for fragment, encoding in decode_header(header_value):
                 if isinstance(fragment, bytes):
-                    if encoding:
-                        decoded_string += fragment.decode(encoding)
-                    else:
-                        decoded_string += fragment.decode('utf-8', errors='ignore')
+                    decoded_fragments.append(decode_bytes(fragment, encoding))
                 else:
-                    decoded_string += fragment
-            return decoded_string.strip()
+                    decoded_fragments.append(fragment)
+            return ''.join(decoded_fragments).strip()
         except Exception as e:
             logger.error(f"Header decoding failed: {str(e)}")
             return str(header_value)
@@ -210,57 +238,72 @@ class EmailProcessor:
         emails = re.findall(email_pattern, address_header)
         return emails
     
-    def extract_email_body(self, email_message):
-        """Extract email body (text and HTML)"""
-        text_body = ""
-        html_body = ""
-        
-        if email_message.is_multipart():
-            for part in email_message.walk():
-                content_type = part.get_content_type()
-                
-                if content_type == "text/plain":
-                    payload = part.get_payload(decode=True)
-                    if payload:
-                        text_body += payload.decode('utf-8', errors='ignore')
-                
-                elif content_type == "text/html":
-                    payload = part.get_payload(decode=True)
-                    if payload:
-                        html_body += payload.decode('utf-8', errors='ignore')
-        else:
-            payload = email_message.get_payload(decode=True)
-            if payload:
-                content_type = email_message.get_content_type()
-                decoded_payload = payload.decode('utf-8', errors='ignore')
-                
-                if content_type == "text/html":
-                    html_body = decoded_payload
-                else:
-                    text_body = decoded_payload
+    def get_attachment_filename(self, part):
+        """
+        Get attachment filename from the raw MIME headers
+        Raw 8-bit bytes are decoded with decode_bytes instead of being
+        replaced by U+FFFD as Message.get_filename() does for them.
+        """
+        headers = Message()
+        for name, value in part.raw_items():
+            if name.lower() in ('content-disposition', 'content-type'):
+                raw_value = str(value).encode('utf-8', 'surrogateescape')
+                headers[name] = decode_bytes(raw_value)
         
-        return html_body if html_body else text_body
+        filename = headers.get_filename()
+        return self.decode_header_value(filename) if filename else None
     
-    def process_attachments(self, email_message):
-        """Process email attachments"""
+    def parse_message_parts(self, email_message):
+        """
+        Walk the MIME tree once and collect body and attachments
+        Each leaf part is decoded a single time using its declared charset.
+        Parts marked as attachment with a filename (attached messages
+        included) are stored only as attachments and not walked into;
+        without a filename they are treated as body parts.
+        Returns a dict with 'text_body', 'html_body' and 'attachments'.
+        """
+        text_parts = []
+        html_parts = []
         attachments = []
+        is_multipart = email_message.is_multipart()
+        pending = [email_message]
         
-        for part in email_message.walk():
+        while pending:
+            part = pending.pop()
+            content_type = part.get_content_type()
+            
             if part.get_content_disposition() == 'attachment':
-                filename = part.get_filename()
+                filename = self.get_attachment_filename(part)
                 if filename:
-                    filename = self.decode_header_value(filename)
                     content = part.get_payload(decode=True)
-                    
-                    attachment_info = {
+                    attachments.append({
                         'filename': filename,
-                        'content_type': part.get_content_type(),
+                        'content_type': content_type,
                         'size': len(content) if content else 0
-                    }
-                    
-                    attachments.append(attachment_info)
+                    })
+                    continue
+            
+            if part.is_multipart():
+                # Reversed so parts are popped in document order
+                pending.extend(reversed(part.get_payload()))
+                continue
+            
+            if content_type == "text/html":
+                target = html_parts
+            elif content_type == "text/plain" or not is_multipart:
+                target = text_parts
+            else:
+                continue
+            
+            payload = part.get_payload(decode=True)
+            if payload:
+                target.append(decode_bytes(payload, part.get_content_charset()))
         
-        return attachments
+        return {
+            'text_body': ''.join(text_parts),
+            'html_body': ''.join(html_parts),
+            'attachments': attachments
+        }
     
     def store_email_in_database(self, user_id, email_data):
         """Store email in MySQL database"""
@@ -323,16 +366,21 @@ class EmailProcessor:
     def process_email(self, email_content):
         """Process incoming email"""
         try:
-            email_message = email.message_from_string(email_content)
-            
-            # Extract headers
-            from_header = email_message.get('From', '')
-            to_header = email_message.get('To', '')
-            cc_header = email_message.get('Cc', '')
-            bcc_header = email_message.get('Bcc', '')
+            # Raw bytes keep 8bit bodies intact for charset-aware decoding
+            if isinstance(email_content, bytes):
+                email_message = email.message_from_bytes(email_content)
+            else:
+                email_message = email.message_from_string(email_content)
+            
+            # Extract headers - decoded once to str, since raw 8-bit
+            # headers come back from message_from_bytes as Header objects
+            from_header = self.decode_header_value(email_message.get('From', ''))
+            to_header = self.decode_header_value(email_message.get('To', ''))
+            cc_header = self.decode_header_value(email_message.get('Cc', ''))
+            bcc_header = self.decode_header_value(email_message.get('Bcc', ''))
             subject = self.decode_header_value(email_message.get('Subject', ''))
-            message_id = email_message.get('Message-ID', '')
-            date_header = email_message.get('Date', '')
+            message_id = self.decode_header_value(email_message.get('Message-ID', ''))
+            date_header = self.decode_header_value(email_message.get('Date', ''))
             
             logger.info(f"Processing email: {subject} from {from_header}")
             
@@ -361,22 +409,22 @@ class EmailProcessor:
             except:
                 received_at = datetime.now()
             
-            # Extract body and attachments
-            body = self.extract_email_body(email_message)
-            attachments = self.process_attachments(email_message)
+            # Extract body and attachments in a single pass
+            parts = self.parse_message_parts(email_message)
+            body = parts['html_body'] or parts['text_body']
             
             # Prepare email data
             email_data = {
                 'message_id': message_id,
                 'thread_id': message_id or f"thread-{datetime.now().strftime('%Y%m%d%H%M%S')}",
                 'from_address': from_emails[0] if from_emails else from_header,
-                'from_name': self.decode_header_value(from_header),
+                'from_name': from_header,
                 'to_address': ', '.join(to_emails),
                 'cc_address': ', '.join(cc_emails) if cc_emails else None,
                 'bcc_address': ', '.join(bcc_emails) if bcc_emails else None,
                 'subject': subject,
                 'body': body,
-                'attachments': attachments,
+                'attachments': parts['attachments'],
                 'received_at': received_at
             }
             
@@ -396,8 +444,8 @@ class EmailProcessor:
 def main():
     """Main function to process email from stdin"""
     try:
-        # Read email content from stdin
-        email_content = sys.stdin.read()
+        # Read raw email bytes from stdin (charsets are resolved per part)
+        email_content = sys.stdin.buffer.read()
         
         if not email_content.strip():
             logger.error("No email content received from stdin")